@@ -4,16 +4,25 @@
 # Final version: Includes Server-Side Validation, Official Login, AI Routing, and CORS
 # =================================================================
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 from flask_cors import CORS 
 import time
 import random
+import heapq
+import threading
 import logging
 import re # <-- Import the regex module for validation
+import os
+import base64
+import hashlib
+import hmac
+import secrets
+import orjson # <-- Fast JSON parsing/encoding for the API
 
 app = Flask(__name__)
 CORS(app) 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # --- MOCK DATA STORES & MAPPING ---
 OFFICER_WORKLOADS = {
@@ -23,6 +32,20 @@ OFFICER_WORKLOADS = {
     'Officer_D_Roads': 15, 
 }
 
+def _build_department_heaps(workloads):
+    """Groups officers by department suffix into (workload, officer_id) min-heaps."""
+    heaps = {}
+    for officer_id, workload in workloads.items():
+        heaps.setdefault(officer_id.rsplit('_', 1)[-1], []).append((workload, officer_id))
+    for heap in heaps.values():
+        heapq.heapify(heap)
+    return heaps
+
+# e.g. {'Water': [(5, 'Officer_B_Water'), (12, 'Officer_A_Water')], 'Roads': [...]}
+_DEPT_HEAPS = _build_department_heaps(OFFICER_WORKLOADS)
+# Guards the read-modify-write on _DEPT_HEAPS / OFFICER_WORKLOADS across threads
+_WORKLOAD_LOCK = threading.Lock()
+
 DEPARTMENT_MAPPING = {
     'Road Maintenance': 'Public_Works_Dept',
     'Water Supply': 'Water_Supply_Dept',
@@ -47,22 +70,79 @@ DEPARTMENT_MAPPING = {
     'Other': 'General_Admin_Dept'
 }
 
+# Department for categories missing from DEPARTMENT_MAPPING
+_DEFAULT_DEPT = 'General_Admin_Dept'
+# Department -> prefix used to find its officers, e.g. 'Water_Supply_Dept' -> 'Water'
+_DEPT_PREFIX = {dept: dept.split('_')[0] for dept in DEPARTMENT_MAPPING.values()}
+# Department -> manager assignee label, e.g. 'Water_Supply_Dept' -> 'Water_Supply_Dept_Manager'
+_MANAGER_LABELS = {dept: f"{dept}_Manager" for dept in DEPARTMENT_MAPPING.values()}
+
+# --- PASSWORD HASHING (scrypt, salted) ---
+_SCRYPT_PARAMS = {"n": 2**14, "r": 8, "p": 1}
+
+def hash_password(password):
+    """Returns a salted scrypt hash in the form 'scrypt$<salt hex>$<key hex>'."""
+    salt = secrets.token_bytes(16)
+    key = hashlib.scrypt(password.encode(), salt=salt, **_SCRYPT_PARAMS)
+    return f"scrypt${salt.hex()}${key.hex()}"
+
+def verify_password(password, stored_hash):
+    """Checks a password against a hash_password() string in constant time."""
+    _, salt_hex, key_hex = stored_hash.split('$')
+    key = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt_hex), **_SCRYPT_PARAMS)
+    return hmac.compare_digest(key, bytes.fromhex(key_hex))
+
 # --- MOCK OFFICIAL DATABASE (For Login/Security) ---
 OFFICIALS_DB = {
     "john.doe@gov.in": {  # <--- CHANGE this USERNAME
-        "password_hash": "hashed_password_doe", # <--- CHANGE this MOCK PASSWORD
+        "password_hash": hash_password("password_doe"), # <--- CHANGE this MOCK PASSWORD
         "govt_id": "GOV1001A", # <--- CHANGE this GOVT ID
         "department": "Water_Supply_Dept",
         "name": "John Doe"
     },
     "sara.smith@gov.in": { # <--- CHANGE this USERNAME
-        "password_hash": "hashed_password_smith", # <--- CHANGE this MOCK PASSWORD
+        "password_hash": hash_password("password_smith"), # <--- CHANGE this MOCK PASSWORD
         "govt_id": "GOV2002B", # <--- CHANGE this GOVT ID
         "department": "Public_Works_Dept",
         "name": "Sara Smith"
     }
 }
 
+# (username, govt_id) -> record, so a single lookup checks both identifiers
+_OFFICIALS_BY_CREDS = {(username, rec['govt_id']): rec for username, rec in OFFICIALS_DB.items()}
+# Verified when no record matches, so a miss costs the same scrypt run as a hit
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+# --- SESSION TOKENS (JWT, HS256) ---
+# Set JWT_SECRET in the environment; otherwise a random key is used and tokens die with the process.
+_JWT_KEY = os.environ.get('JWT_SECRET', '').encode()
+if not _JWT_KEY:
+    logger.warning("JWT_SECRET is not set; using a random per-process signing key.")
+    _JWT_KEY = secrets.token_bytes(32)
+
+_JWT_TTL_SECONDS = 8 * 3600
+
+def _b64url(raw):
+    """Base64url without padding, as JWT segments require."""
+    return base64.urlsafe_b64encode(raw).rstrip(b'=')
+
+_JWT_HEADER = _b64url(orjson.dumps({"alg": "HS256", "typ": "JWT"}))
+# Keyed once at import; each token signs on a copy, so the key setup is not redone per login
+_JWT_SIGNER = hmac.new(_JWT_KEY, digestmod=hashlib.sha256)
+
+def issue_session_token(claims):
+    """Encodes the claims as a compact HS256-signed JWT."""
+    signing_input = _JWT_HEADER + b'.' + _b64url(orjson.dumps(claims))
+    signer = _JWT_SIGNER.copy()
+    signer.update(signing_input)
+    return (signing_input + b'.' + _b64url(signer.digest())).decode('ascii')
+
+# --- PRE-COMPILED VALIDATION PATTERNS ---
+# fullmatch() anchors both ends, so no ^...$ is needed here.
+_PHONE_RE = re.compile(r'\d{10}')
+_PUBLIC_ID_RE = re.compile(r'[0-9A-Z]{10,12}')
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
 # --- VALIDATION HELPER FUNCTION ---
 
 def validate_citizen_input(data):
@@ -73,28 +153,34 @@ def validate_citizen_input(data):
     
     errors = {}
 
-    # 1. Phone Number Check (Must be exactly 10 digits)
-    # Regex: ^\d{10}$ ensures start (^), 10 digits (\d{10}), and end ($)
-    if not re.fullmatch(r'^\d{10}$', phone):
+    # 1. Phone Number Check (Must be a string of exactly 10 digits)
+    # Regex: \d{10} with fullmatch ensures exactly 10 digits, nothing more
+    if not isinstance(phone, str):
+        errors['phone'] = "Phone number must be sent as a string."
+    elif not _PHONE_RE.fullmatch(phone):
         errors['phone'] = "Phone number must be exactly 10 digits."
 
     # 2. Public ID Check (Must be 10, 11, or 12 characters, alphanumeric)
     # Regex: [0-9A-Z] allows digits and uppercase letters
-    if not re.fullmatch(r'^[0-9A-Z]{10,12}$', public_id):
+    if not isinstance(public_id, str):
+        errors['public_id'] = "Public ID must be sent as a string."
+    elif not _PUBLIC_ID_RE.fullmatch(public_id):
         errors['public_id'] = "Public ID must be 10 to 12 alphanumeric characters."
 
     # 3. Basic Email Format Check
     # A standard regex check for email format
-    if not re.fullmatch(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+    if not isinstance(email, str):
+        errors['email'] = "Email must be sent as a string."
+    elif not _EMAIL_RE.fullmatch(email):
         errors['email'] = "Invalid email format."
         
     return errors
 
-# --- AI PROCESSING & ROUTING LOGIC (UNCHANGED) ---
+# --- AI PROCESSING & ROUTING LOGIC ---
 
 def generate_unique_id():
-    """Generates a unique tracking ID."""
-    return f"GRV-{int(time.time() * 1000) % 1000000}"
+    """Generates a unique tracking ID (48 random bits, so IDs don't collide under load)."""
+    return "GRV-" + secrets.token_urlsafe(6)
 
 def ai_categorize_and_score(description, citizen_category):
     """MOCK AI function: Categorizes and assigns Priority Score (P: 1-10)."""
@@ -109,7 +195,8 @@ def ai_categorize_and_score(description, citizen_category):
         
     critical_keywords_found = len([word for word in ['dangerous', 'urgent', 'fatal', 'flooding'] if word in keywords])
     
-    priority_score = 3 + random.randint(0, 2) + critical_keywords_found * 2 
+    # Mock jitter: 0, 1 or 2 extra points
+    priority_score = 3 + random.randrange(3) + critical_keywords_found * 2 
     
     if 'critical' in refined_category.lower() or 'safety' in citizen_category.lower():
         priority_score += 2
@@ -122,45 +209,62 @@ def smart_route_and_assign(refined_category, priority_score, location_coords):
     """Routes the complaint based on category, location, and load."""
     
     base_category = refined_category.split('_')[0] 
-    target_department = DEPARTMENT_MAPPING.get(base_category, 'General_Admin_Dept')
+    target_department = DEPARTMENT_MAPPING.get(base_category, _DEFAULT_DEPT)
     
-    dept_prefix = target_department.split('_')[0]
-    department_officers = {
-        k: v for k, v in OFFICER_WORKLOADS.items() if k.endswith(dept_prefix.split('_')[0])
-    }
+    department_heap = _DEPT_HEAPS.get(_DEPT_PREFIX[target_department])
     
-    if not department_officers:
-        return target_department, f"{target_department}_Manager"
+    if not department_heap:
+        return target_department, _MANAGER_LABELS[target_department]
 
     # Priority Override: If P >= 8, route to Manager immediately.
     if priority_score >= 8:
-        return target_department, f"{target_department}_Manager"
-    
-    # Load Balancing: Find the least busy officer
-    assigned_officer = min(department_officers, key=department_officers.get)
+        return target_department, _MANAGER_LABELS[target_department]
     
-    OFFICER_WORKLOADS[assigned_officer] += 1
+    # Load Balancing: Take the least busy officer off the heap and push them back with +1
+    with _WORKLOAD_LOCK:
+        workload, assigned_officer = department_heap[0]
+        heapq.heapreplace(department_heap, (workload + 1, assigned_officer))
+        
+        # Keep the flat per-officer view in sync with the heap
+        OFFICER_WORKLOADS[assigned_officer] = workload + 1
     
     return target_department, assigned_officer
 
 # --- API ENDPOINTS ---
 
+def _json(payload, status=200):
+    """Serializes the payload with orjson into a JSON response."""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+def _body():
+    """Parses the raw request body once with orjson (an empty body counts as {})."""
+    return orjson.loads(request.get_data(cache=False) or b'{}')
+
+@app.errorhandler(orjson.JSONDecodeError)
+def handle_bad_json(e):
+    """Rejects request bodies that are not valid JSON."""
+    logger.warning("Rejected malformed JSON body: %s", e)
+    return _json({"success": False, "message": "Request body must be valid JSON."}, 400)
+
 @app.route('/api/submit_complaint', methods=['POST'])
 def submit_complaint():
     """Endpoint for citizen submission."""
+    complaint_data = _body()
+    if not isinstance(complaint_data, dict):
+        # Valid JSON that isn't an object carries no fields: fails validation below with a 400
+        complaint_data = {}
+
     try:
-        complaint_data = request.json
-        
         # --- SERVER-SIDE VALIDATION CHECK ---
         validation_errors = validate_citizen_input(complaint_data)
         if validation_errors:
-            logging.warning(f"Validation failed for citizen submission: {validation_errors}")
+            logger.warning("Validation failed for citizen submission: %s", validation_errors)
             # Return 400 Bad Request with specific errors
-            return jsonify({
+            return _json({
                 "success": False, 
                 "message": "One or more input fields failed server validation.",
                 "errors": validation_errors
-            }), 400
+            }, 400)
         # -----------------------------------
 
         tracking_id = generate_unique_id()
@@ -178,69 +282,70 @@ def submit_complaint():
             complaint_data.get('location_coords', 'N/A')
         )
         
-        logging.info(f"New Complaint [{tracking_id}] | P={priority_score} | Assigned to {assigned_officer}")
+        logger.info("New Complaint [%s] | P=%d | Assigned to %s", tracking_id, priority_score, assigned_officer)
         
-        return jsonify({
+        return _json({
             "success": True, 
             "tracking_id": tracking_id,
             "status": "Under Review",
+            "department": target_department,
             "assigned_to": assigned_officer,
             "priority": priority_score 
-        }), 200
+        }, 200)
 
     except Exception as e:
-        logging.error(f"Error processing complaint: {e}")
-        return jsonify({"success": False, "message": f"Server Error: {str(e)}"}), 500
+        logger.error("Error processing complaint: %s", e)
+        return _json({"success": False, "message": f"Server Error: {str(e)}"}, 500)
 
 
 @app.route('/api/official/login', methods=['POST'])
 def official_login():
     """Authenticates the official using Username/Password + Unique Govt ID."""
-    data = request.json
+    data = _body()
+    if not isinstance(data, dict):
+        # Valid JSON that isn't an object carries no fields: falls through to the 400 below
+        data = {}
     username = data.get('username')
     password = data.get('password')
     govt_id = data.get('govt_id')
     
-    if not username or not password or not govt_id:
-        return jsonify({
+    if not all(isinstance(field, str) and field for field in (username, password, govt_id)):
+        return _json({
             "success": False, 
             "message": "Missing required fields (Username, Password, Govt ID)."
-        }), 400
+        }, 400)
 
-    official_record = OFFICIALS_DB.get(username)
+    official_record = _OFFICIALS_BY_CREDS.get((username, govt_id))
+    stored_hash = official_record['password_hash'] if official_record else _DUMMY_PASSWORD_HASH
     
-    if not official_record:
-        return jsonify({
-            "success": False, 
-            "message": "Authentication failed: Invalid credentials."
-        }), 401
-
-    if official_record['password_hash'] != f"hashed_password_{username.split('@')[0].split('.')[-1]}":
-        return jsonify({
+    # One branch for bad username, bad Govt ID or bad password: no hint which one failed
+    if not verify_password(password, stored_hash) or official_record is None:
+        logger.warning("Failed login attempt for user: %s", username)
+        return _json({
             "success": False, 
             "message": "Authentication failed: Invalid credentials."
-        }), 401
-    
-    if official_record['govt_id'] != govt_id:
-        logging.warning(f"Failed Govt ID validation attempt for user: {username}")
-        return jsonify({
-            "success": False, 
-            "message": "Authentication failed: Unique Government ID mismatch."
-        }), 401
+        }, 401)
 
-    session_token = f"JWT.{official_record['department']}.{hash(username)}"
+    issued_at = int(time.time())
+    session_token = issue_session_token({
+        "sub": username,
+        "dept": official_record['department'],
+        "iat": issued_at,
+        "exp": issued_at + _JWT_TTL_SECONDS
+    })
     
-    logging.info(f"Official {official_record['name']} ({official_record['department']}) logged in successfully.")
+    logger.info("Official %s (%s) logged in successfully.", official_record['name'], official_record['department'])
 
-    return jsonify({
+    return _json({
         "success": True, 
         "message": "Login successful.",
         "token": session_token,
         "department": official_record['department'],
         "official_name": official_record['name']
-    }), 200
+    }, 200)
 
 
 if __name__ == '__main__':
-    # Ensure you run 'pip install Flask flask-cors'
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Ensure you run 'pip install Flask flask-cors orjson gunicorn'
+    # Local development only; in production run 'gunicorn app:app' (see gunicorn.conf.py)
+    app.run(debug=False, port=5000)
\ No newline at end of file
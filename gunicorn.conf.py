@@ -0,0 +1,20 @@
+# =================================================================
+# GUNICORN CONFIG (PRODUCTION SERVER)
+# Install with: pip install Flask flask-cors orjson gunicorn
+# Run with: gunicorn app:app   (picks up this file automatically)
+# =================================================================
+
+import multiprocessing
+import os
+
+# Same address the frontend pages call (http://127.0.0.1:5000)
+bind = os.environ.get('GRIEVANCE_BIND', '127.0.0.1:5000')
+
+# Officer workloads and the fallback JWT key live in process
+# memory, so one worker process keeps them consistent. Concurrency comes from threads.
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = multiprocessing.cpu_count() * 2 + 1
+
+keepalive = 5
+accesslog = '-'